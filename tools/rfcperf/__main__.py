@@ -1,6 +1,7 @@
 import sys
 
-from .app import main
+from .app  import main
+from .util import print_colored
 
 try:
     sys.exit(main())
@@ -8,8 +9,8 @@ except Exception as exception:
     message = str(exception)
     if message:
         if not message.endswith("."): message += "."
-        print("\033[31m" + "ERROR: " + message + "\033[0m")
+        print_colored("red", f"ERROR: {message}")
     else:
-        print("\033[31m" + "ERROR: Internal error." + "\033[0m")
+        print_colored("red", "ERROR: Internal error.")
         raise
     sys.exit(1)
@@ -1,16 +1,23 @@
 import argparse
+import concurrent.futures
+import contextlib
 import datetime
+import functools
 import numpy as np
+import os
 import pathlib
+import shutil
 import sys
+import threading
 
 from .config  import Configuration, load_config, store_config
 from .drivers import get_drivers, get_driver
 from .data    import set_cache_dir, get_train_dataset_filenames, \
                      get_test_dataset_filenames, generate_datasets, \
-                     ingest_test_dataset, load_labelled_dataset_json, \
+                     ingest_test_dataset, load_labelled_dataset_file, \
                      sample_dataset, store_labelled_dataset
 from .report  import write_report
+from .util    import default_num_threads, get_num_cores, prefetch_files, print_colored
 
 def generate_default_config_file(filename):
 
@@ -21,14 +28,14 @@ def generate_default_config_file(filename):
     store_config(filename, config)
 
 def profile(train_data_filename, test_data_filename, classifiers, config_file, data_sizes, test_percentage, num_estimators,
-            random_seed, max_tree_depth, num_features, num_threads, timeout, use_cache):
+            random_seed, max_tree_depth, num_features, num_threads, num_jobs, timeout, use_cache, prefetch):
 
     # Load configuration. If the configuration file does not exist, generate a
     # default configuration file.
     try:
         config = load_config(config_file)
     except FileNotFoundError:
-        print("\033[35m" + f"Generating default configuration file..." + "\033[0m")
+        print_colored("magenta", "Generating default configuration file...")
         generate_default_config_file(config_file)
         print(f"Generated configuration file: '{config_file}'.")
         print("Please edit the generated configuration file and try again.")
@@ -37,79 +44,150 @@ def profile(train_data_filename, test_data_filename, classifiers, config_file, d
     # Set cache directory based on configuration.
     set_cache_dir(config.cache_dir)
 
-    # Generate datasets.
-    print("\033[35m" + f"Generating datasets..." + "\033[0m")
+    # Create a driver for each of the specified classifiers.
+    drivers = {}
+    for classifier_name in classifiers:
+
+        try:
+            classifier = config.get_classifier(classifier_name)
+        except KeyError:
+            print_colored("red", f"Unknown classifier: '{classifier_name}'.")
+            continue
+
+        drivers[classifier_name] = get_driver(classifier["driver"])(**classifier["args"])
+
+    # Generate datasets, only in the formats used by the classifiers.
+    data_formats = tuple(sorted({driver.get_data_format() for driver in drivers.values()}))
+    print_colored("magenta", "Generating datasets...")
     if test_data_filename is not None and test_percentage is not None:
         raise Exception("Either a test percentage or a test data file should be specified.")
     if test_data_filename is None and test_percentage is None:
         test_percentage = 33
-    generate_datasets(train_data_filename, data_sizes, use_cache=use_cache, test_percentage=test_percentage, seed=random_seed)
+    generate_datasets(train_data_filename, data_sizes, use_cache=use_cache, test_percentage=test_percentage, seed=random_seed,
+                      data_formats=data_formats, num_jobs=num_jobs)
 
     # Optionally ingest the specified test dataset.
     if test_data_filename is not None:
-        print("\033[35m" + f"Ingesting test dataset..." + "\033[0m")
-        ingest_test_dataset(test_data_filename)
+        print_colored("magenta", "Ingesting test dataset...")
+        ingest_test_dataset(test_data_filename, data_formats, use_cache=use_cache)
 
     # Create run path.
     run_path = config.run_dir / datetime.datetime.now().isoformat()
     run_path.mkdir()
 
-    # Run all classifiers.
-    statistics = {}
-    for classifier_name in classifiers:
-
-        print("\033[35m" + f"Running {classifier_name} using {num_threads} threads..." + "\033[0m")
+    # Collect the runs for all combinations of classifier and data size.
+    runs = []
+    for classifier_name, driver in drivers.items():
 
-        try:
-            classifier = config.get_classifier(classifier_name)
-        except KeyError:
-            print("\033[31m" + "Unknown classifier: '" + classifier_name + "'." + "\033[0m")
-            continue
-
-        driver = get_driver(classifier["driver"])(**classifier["args"])
         data_format = driver.get_data_format()
 
         classifier_run_path = run_path / classifier_name
-        classifier_run_path.mkdir()
 
-        classifier_statistics = []
+        # An ingested test dataset is shared by all data sizes.
+        if test_data_filename is not None:
+            run_test_data_filename, run_test_label_filename = get_test_dataset_filenames(data_format)
+
         for data_size in data_sizes:
-            print("\033[32m" + str(data_size) + "\033[0m")
             run_train_data_filename, run_train_label_filename = get_train_dataset_filenames(data_format, data_size, test_percentage)
-            if test_data_filename is not None:
-                run_test_data_filename, run_test_label_filename = get_test_dataset_filenames(data_format)
-            else:
+            if test_data_filename is None:
                 run_test_data_filename, run_test_label_filename = get_test_dataset_filenames(data_format, data_size, test_percentage)
 
-            run_statistics = {"data_size": data_size}
             test_run_path = classifier_run_path / str(data_size)
-            test_run_path.mkdir()
+            runs.append((classifier_name, driver, data_size, test_run_path,
+                         (run_train_data_filename, run_train_label_filename, run_test_data_filename, run_test_label_filename)))
+
+    # Let the drivers prepare the training datasets, such that this is not
+    # part of any measured run.
+    print_colored("magenta", "Preparing datasets...")
+    for _, driver, _, _, (run_train_data_filename, run_train_label_filename, _, _) in runs:
+        driver.prepare(run_train_data_filename, run_train_label_filename, random_seed=random_seed)
+
+    # Unless specified, the number of threads is chosen such that all jobs fit
+    # on the available cores.
+    num_cores = get_num_cores()
+    if num_threads is None:
+        num_threads = default_num_threads(num_jobs)
+    if num_threads > num_cores:
+        print_colored("yellow", f"Using {num_threads} threads on {num_cores} cores, which oversubscribes the cores.")
+
+    # Keep OpenMP and BLAS libraries used by the classifiers from starting
+    # threads of their own on top of the requested number of threads.
+    for name in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ.setdefault(name, str(num_threads))
+
+    # Concurrent runs compete for the same cores, which would distort the
+    # measurements, so only as many jobs are run as there are cores for all of
+    # their threads.
+    max_num_jobs = max(1, num_cores // num_threads)
+    if num_jobs > max_num_jobs:
+        print_colored("yellow", f"Limiting the number of jobs to {max_num_jobs} ({num_threads} threads per job).")
+        num_jobs = max_num_jobs
+
+    # Create the directories for all runs up front.
+    for _, _, _, test_run_path, _ in runs:
+        test_run_path.mkdir(parents=True)
+
+    # Run all classifiers. Runs are either executed one by one, or submitted to
+    # a pool of worker processes. Either way, results are collected in order.
+    statistics = {}
+    run_kwargs = {"num_estimators": num_estimators,
+                  "random_seed": random_seed,
+                  "max_tree_depth": max_tree_depth,
+                  "num_features": num_features,
+                  "num_threads": num_threads}
+    with contextlib.ExitStack() as stack:
+
+        if num_jobs > 1:
+            executor = stack.enter_context(concurrent.futures.ProcessPoolExecutor(max_workers=num_jobs))
+            futures = [executor.submit(run_classifier, driver, data_size, test_run_path, filenames, run_kwargs)
+                       for _, driver, data_size, test_run_path, filenames in runs]
+            get_results = [future.result for future in futures]
+        else:
+            get_results = [functools.partial(run_classifier, driver, data_size, test_run_path, filenames, run_kwargs)
+                           for _, driver, data_size, test_run_path, filenames in runs]
+
+        for index, ((classifier_name, _, data_size, _, _), get_result) in enumerate(zip(runs, get_results)):
+
+            if classifier_name not in statistics:
+                print_colored("magenta", f"Running {classifier_name} using {num_threads} threads...")
+                statistics[classifier_name] = []
+
+            print_colored("green", data_size)
+
+            # Optionally load the datasets of the next run into the page cache
+            # while this run executes. This competes with the run for I/O and
+            # page cache, so it is off by default.
+            if prefetch and num_jobs == 1 and index + 1 < len(runs):
+                _, _, _, _, next_filenames = runs[index + 1]
+                threading.Thread(target=prefetch_files, args=next_filenames, daemon=True).start()
+
             try:
-                run_statistics.update(driver.run(test_run_path,
-                                                 run_train_data_filename,
-                                                 run_train_label_filename,
-                                                 run_test_data_filename,
-                                                 run_test_label_filename,
-                                                 num_estimators=num_estimators,
-                                                 random_seed=random_seed,
-                                                 max_tree_depth=max_tree_depth,
-                                                 num_features=num_features,
-                                                 num_threads=num_threads))
+                run_statistics = get_result()
             except Exception as exception:
-                print("\033[31m" + "Run failed: '" + str(exception) + "'." + "\033[0m")
+                print_colored("red", f"Run failed: '{exception}'.")
             else:
-                classifier_statistics.append(run_statistics)
+                statistics[classifier_name].append(run_statistics)
 
+    # Write a report per classifier and a combined report. For a single
+    # classifier the combined report is identical, so it is copied instead.
+    for classifier_name, classifier_statistics in statistics.items():
         write_report(run_path / f"{classifier_name}.pdf", num_threads, {classifier_name: classifier_statistics})
-        statistics[classifier_name] = classifier_statistics
+    if len(statistics) == 1:
+        (only_classifier_name,) = statistics
+        shutil.copyfile(run_path / f"{only_classifier_name}.pdf", run_path / "all.pdf")
+    else:
+        write_report(run_path / f"all.pdf", num_threads, statistics)
+
+def run_classifier(driver, data_size, run_path, filenames, run_kwargs):
 
-    # Write combined report.
-    write_report(run_path / f"all.pdf", num_threads, statistics)
+    run_statistics = {"data_size": data_size}
+    run_statistics.update(driver.run(run_path, *filenames, **run_kwargs))
+    return run_statistics
 
 def sample(data_input_filename, data_output_filename, label_output_filename,
            data_format, sample_size, with_replacement, random_seed):
 
-    data_points, labels = load_labelled_dataset_json(data_input_filename)
+    data_points, labels = load_labelled_dataset_file(data_input_filename)
     assert len(data_points) == len(labels)
 
     if sample_size is None:
@@ -135,7 +213,9 @@ def parse_command_line_arguments():
         return value
 
     def data_size_list(text):
-        return list(sorted([int(value) for value in text.split(",")]))
+        # Duplicate data sizes are dropped, since each data size has its own
+        # datasets and run directory.
+        return tuple(sorted({int(value) for value in text.split(",")}))
 
     parser = argparse.ArgumentParser(prog="rfcperf", description="A tool to profile random forest classifiers.")
 
@@ -151,12 +231,14 @@ def parse_command_line_arguments():
     profile.add_argument("-d", "--max-tree-depth", type=positive_integer, default="50")
     profile.add_argument("-f", "--num-features", type=positive_integer)
     profile.add_argument("-e", "--num-estimators", type=positive_integer, default="150")
-    profile.add_argument("-t", "--num-threads", type=positive_integer, default="1")
+    profile.add_argument("-t", "--num-threads", type=positive_integer)
+    profile.add_argument("-j", "--num-jobs", type=positive_integer, default="1")
     profile.add_argument("-x", "--timeout", type=positive_integer, default=None)
     profile.add_argument("-s", "--random-seed", type=positive_integer)
     profile.add_argument("-C", "--no-cache", dest="use_cache", action="store_false")
+    profile.add_argument("-P", "--prefetch", action="store_true")
 
-    sample = subparsers.add_parser("sample", help="draw a sample from an existing (json-pickle) dataset")
+    sample = subparsers.add_parser("sample", help="draw a sample from an existing (JSON, .npz or .pkl) dataset")
     sample.add_argument("data_input_filename", type=pathlib.Path, metavar="DATA_INPUT_FILE")
     sample.add_argument("data_output_filename", type=pathlib.Path, metavar="DATA_OUTPUT_FILE")
     sample.add_argument("label_output_filename", type=pathlib.Path, nargs="?", metavar="LABEL_OUTPUT_FILE")
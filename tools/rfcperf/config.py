@@ -17,6 +17,17 @@ class Configuration:
 
 		return self.classifiers[name]
 
+def parse_boolean(value):
+
+	if isinstance(value, bool):
+		return value
+	text = str(value).strip().lower()
+	if text in ("1", "yes", "true", "on"):
+		return True
+	if text in ("0", "no", "false", "off"):
+		return False
+	raise ValueError(f"Not a boolean: '{value}'.")
+
 def load_config(filename):
 
 	parser = configparser.ConfigParser()
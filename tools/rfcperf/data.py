@@ -1,18 +1,48 @@
+import concurrent.futures
+import contextlib
+import functools
+import hashlib
+import io
 import jsonpickle
 import jsonpickle.ext.numpy
 import numpy as np
+import os
 import pathlib
+import pickle
 import struct
 
+from .util import print_colored
+
 jsonpickle.ext.numpy.register_handlers()
 
 CACHE_DIR = pathlib.Path("cache")
 DATA_FORMATS = ("csv", "bin", "balsa")
 
+# The header of .bin files consists of the number of columns only.
+BIN_HEADER = struct.Struct("<I")
+
+# The number of rows formatted at a time when writing CSV files.
+CSV_CHUNK_SIZE = 8192
+
+# Scalar types supported by the balsa file format.
+BALSA_SIZE = struct.Struct("<B")
+BALSA_VALUE_TYPES = {b"ui08": struct.Struct("<B"), b"ui32": struct.Struct("<I"), b"fl32": struct.Struct("<f"), b"fl64": struct.Struct("<d")}
+BALSA_SCALAR_TYPE_IDS = {np.dtype(np.float32): "fl32", np.dtype(np.uint8): "ui08"}
+
 def set_cache_dir(path):
 
     global CACHE_DIR
-    CACHE_DIR = pathlib.Path(path)
+    CACHE_DIR = pathlib.Path(path).absolute()
+    get_dataset_filenames.cache_clear()
+
+# Labels are either 0 or 1, so they are kept as 8-bit integers in memory. They
+# are only widened to float32 where a data format requires it.
+def to_label_array(labels):
+
+    label_array = np.asarray(labels).astype(np.uint8, copy=False)
+    if not np.array_equal(label_array, labels):
+        raise RuntimeError("Labels must be non-negative integers.")
+    return label_array
 
 def load_labelled_dataset_json(filename):
 
@@ -20,27 +50,105 @@ def load_labelled_dataset_json(filename):
         data_points, labels = jsonpickle.decode(json_file.read())
     assert data_points.dtype == np.float32
     assert labels.dtype == np.float64
-    labels = labels.astype(np.float32)
+    labels = to_label_array(labels)
+    assert data_points.ndim == 2 and data_points.dtype == np.float32
+    assert labels.ndim == 1 and labels.dtype == np.uint8
+    assert len(data_points) == len(labels)
+    return data_points, labels
+
+def load_labelled_dataset_npz(filename):
+
+    with np.load(filename) as npz_file:
+        data_points, labels = npz_file["data_points"], npz_file["labels"]
+    labels = to_label_array(labels)
     assert data_points.ndim == 2 and data_points.dtype == np.float32
-    assert labels.ndim == 1 and labels.dtype == np.float32
+    assert labels.ndim == 1 and labels.dtype == np.uint8
     assert len(data_points) == len(labels)
     return data_points, labels
 
+def load_labelled_dataset_pickle(filename):
+
+    # Pickle files can execute arbitrary code when loaded, so only load files
+    # from trusted sources.
+    with open(filename, "rb") as pickle_file:
+        data_points, labels = pickle.load(pickle_file)
+    labels = to_label_array(labels)
+    assert data_points.ndim == 2 and data_points.dtype == np.float32
+    assert labels.ndim == 1 and labels.dtype == np.uint8
+    assert len(data_points) == len(labels)
+    return data_points, labels
+
+# Loaders of labelled datasets by file extension. Files with any other extension
+# are decoded as (json-pickle) JSON.
+LABELLED_DATASET_LOADERS = {".npz": load_labelled_dataset_npz, ".pkl": load_labelled_dataset_pickle}
+
+def load_labelled_dataset_file(filename):
+
+    filename = pathlib.Path(filename)
+    loader = LABELLED_DATASET_LOADERS.get(filename.suffix, load_labelled_dataset_json)
+    return loader(filename)
+
+def load_labelled_dataset(filename):
+
+    filename = pathlib.Path(filename)
+    if filename.suffix in LABELLED_DATASET_LOADERS:
+        return load_labelled_dataset_file(filename)
+
+    # Decoding (json-pickle) datasets is slow, so a binary copy is kept in the
+    # cache directory. The copy records the modification time and size of the
+    # original, and is only used as long as both still match. The copy is named
+    # after the absolute path of the original, such that datasets with the
+    # same name in different directories do not replace each other's copy.
+    stat_result = filename.stat()
+    source = np.array([stat_result.st_mtime_ns, stat_result.st_size], dtype=np.int64)
+    path_hash = hashlib.sha1(os.fsencode(filename.resolve())).hexdigest()[:16]
+    npz_filename = CACHE_DIR / f"{filename.stem}-{path_hash}.npz"
+    if npz_filename.is_file():
+        with np.load(npz_filename) as npz_file:
+            if "source" in npz_file.files and np.array_equal(npz_file["source"], source):
+                return npz_file["data_points"], npz_file["labels"].astype(np.uint8, copy=False)
+
+    data_points, labels = load_labelled_dataset_file(filename)
+
+    # Write to a temporary file first, such that an interrupted run does not
+    # leave a truncated copy behind.
+    tmp_filename = npz_filename.with_suffix(".npz.tmp")
+    with open(tmp_filename, "wb") as outfile:
+        np.savez(outfile, source=source, data_points=data_points, labels=labels)
+    tmp_filename.replace(npz_filename)
+    return data_points, labels
+
+def load_labelled_dataset_cached(data_format, data_filename, label_filename):
+
+    if data_format == "bin":
+        data_points, labels = load_dataset_bin(data_filename), load_dataset_bin(label_filename)
+    elif data_format == "balsa":
+        data_points, labels = load_dataset_balsa(data_filename), load_dataset_balsa(label_filename)
+    else:
+        raise RuntimeError("Unsupported data format: " + str(data_format) + ".")
+    return data_points, labels.ravel().astype(np.uint8, copy=False)
+
 def load_dataset_bin(filename):
 
-    header_format = "<I"
-    header_size = struct.calcsize(header_format)
-    with open(filename, "rb") as infile:
-        num_columns, = struct.unpack(header_format, infile.read(header_size))
-        dataset = np.frombuffer(infile.read(), "<f4")
-        dataset.shape = (-1, num_columns)
-    return dataset
+    # Read the header and the file size from a raw file descriptor, which avoids
+    # setting up a buffered file object just to read a few bytes.
+    header_size = BIN_HEADER.size
+    fd = os.open(filename, os.O_RDONLY)
+    try:
+        num_columns, = BIN_HEADER.unpack(os.pread(fd, header_size, 0))
+        file_size = os.fstat(fd).st_size
+    finally:
+        os.close(fd)
+
+    # Map the payload instead of reading it, such that pages are loaded on
+    # demand and shared with the page cache. Empty files cannot be mapped.
+    if file_size == header_size:
+        return np.empty((0, num_columns), "<f4")
+    return np.memmap(filename, "<f4", mode="r", offset=header_size).reshape(-1, num_columns)
 
 def read_string(infile):
 
-    fmt = "<B"
-    fmt_size = struct.calcsize(fmt)
-    string_size, = struct.unpack(fmt, infile.read(fmt_size))
+    string_size, = BALSA_SIZE.unpack(infile.read(BALSA_SIZE.size))
     return infile.read(string_size).decode("ascii")
 
 def read_kv_pair(infile):
@@ -53,19 +161,9 @@ def read_kv_pair(infile):
         value = read_string(infile)
 
     else:
-        if raw_value_type == b"ui08":
-            fmt = "<B"
-        elif raw_value_type == b"ui32":
-            fmt = "<I"
-        elif raw_value_type == b"fl32":
-            fmt = "<f"
-        elif raw_value_type == b"fl64":
-            fmt = "<d"
-        else:
-            assert False
-
-        fmt_size = struct.calcsize(fmt)
-        value, = struct.unpack(fmt, infile.read(fmt_size))
+        value_struct = BALSA_VALUE_TYPES.get(raw_value_type)
+        assert value_struct is not None
+        value, = value_struct.unpack(infile.read(value_struct.size))
 
     return key, value
 
@@ -74,9 +172,7 @@ def read_dictionary(infile):
     dict_start_marker = infile.read(4)
     assert dict_start_marker == b"dict"
 
-    fmt = "<B"
-    fmt_size = struct.calcsize(fmt)
-    dict_size, = struct.unpack(fmt, infile.read(fmt_size))
+    dict_size, = BALSA_SIZE.unpack(infile.read(BALSA_SIZE.size))
 
     result = {}
     for i in range(dict_size):
@@ -110,34 +206,70 @@ def load_dataset_balsa(filename):
         scalar_type_id = table_header["scalar_type_id"]
 
         if scalar_type_id == "fl32":
-            size = num_rows * num_columns * 4
-            dataset = np.frombuffer(infile.read(size), "<f4")
+            dtype = np.dtype("<f4")
         elif scalar_type_id == "ui08":
-            size = num_rows * num_columns * 1
-            dataset = np.frombuffer(infile.read(size), "<u1")
+            dtype = np.dtype("<u1")
         else:
             raise RuntimeError("Unsupported value type: '" + scalar_type_id + "'.")
 
-        dataset.shape = (-1, num_columns)
-        assert len(dataset) == num_rows, "The number of rows read does not match the row count stored in the header."
+        # Skip over the table elements to check the table end marker, such that
+        # the elements themselves can be mapped instead of read.
+        offset = infile.tell()
+        size = num_rows * num_columns * dtype.itemsize
+        infile.seek(size, os.SEEK_CUR)
 
         table_end_marker = infile.read(4)
         assert table_end_marker == b"lbat"
 
-        return dataset
+    # Empty tables cannot be mapped.
+    if size == 0:
+        return np.empty((num_rows, num_columns), dtype)
+    return np.memmap(filename, dtype, mode="r", offset=offset, shape=(num_rows, num_columns))
+
+def load_labels_csv(filename):
+
+    # The label is the last column, so only the text after the last comma has
+    # to be parsed. The feature columns are not tokenized at all.
+    with open(filename, "r") as infile:
+        assert infile.readline().rstrip("\n").rpartition(",")[2] == "label"
+        labels = np.fromiter((int(line.rpartition(",")[2]) for line in infile), dtype=np.int8)
+    labels.flags.writeable = False
+    return labels
+
+# The labels of a test dataset are shared between classifiers, and between data
+# sizes if the test dataset was ingested, so loaded labels are cached. The
+# returned arrays are read-only.
+@functools.lru_cache(maxsize=8)
+def load_labels(data_format, data_filename, label_filename):
+
+    if data_format == "csv":
+        return load_labels_csv(data_filename)
+    elif data_format == "bin":
+        return load_dataset_bin(label_filename)
+    elif data_format == "balsa":
+        return load_dataset_balsa(label_filename)
+    else:
+        raise RuntimeError("Unsupported data format: " + str(data_format) + ".")
 
 def store_labelled_dataset_csv(filename, data_points, labels):
 
     assert data_points.ndim == 2 and data_points.dtype == np.float32
-    assert labels.ndim == 1 and labels.dtype == np.float32
+    assert labels.ndim == 1 and labels.dtype == np.uint8
     assert len(data_points) == len(labels)
 
-    num_rows, num_features = len(data_points), data_points.shape[-1]
+    num_features = data_points.shape[-1]
+    header = [f"feature-{i}" for i in range(num_features)] + ["label"]
+    row_format = ",".join(["%.16f"] * num_features + ["%d"]) + "\n"
     with open(filename, "w") as outfile:
-        header = [f"feature-{i}" for i in range(num_features)] + ["label"]
         outfile.write(",".join(header) + "\n")
-        for i in range(num_rows):
-            outfile.write(",".join([f"{value:.16f}" for value in data_points[i]] + [str(int(labels[i]))]) + "\n")
+        # Write the rows in chunks, which bounds the size of the combined array
+        # of data points and labels. Each chunk is formatted by a single string
+        # formatting operation, which is considerably faster than formatting
+        # row by row like np.savetxt() does.
+        for start in range(0, len(data_points), CSV_CHUNK_SIZE):
+            end = start + CSV_CHUNK_SIZE
+            chunk = np.column_stack((data_points[start:end], labels[start:end]))
+            outfile.write((row_format * len(chunk)) % tuple(chunk.ravel().tolist()))
 
 def store_dataset_bin(filename, dataset):
 
@@ -146,83 +278,90 @@ def store_dataset_bin(filename, dataset):
 
     num_rows, num_columns = (*dataset.shape, 1)[:2]
     with open(filename, "wb") as outfile:
-        outfile.write(struct.pack("<I", num_columns))
-        for i in range(num_rows):
-            outfile.write(dataset[i].tobytes())
+        outfile.write(BIN_HEADER.pack(num_columns))
+        np.ascontiguousarray(dataset).tofile(outfile)
 
 def store_labelled_dataset_bin(data_filename, label_filename, data_points, labels):
 
     assert data_points.ndim == 2 and data_points.dtype == np.float32
-    assert labels.ndim == 1 and labels.dtype == np.float32
+    assert labels.ndim == 1 and labels.dtype == np.uint8
     assert len(data_points) == len(labels)
 
+    # The "bin" format only supports float32.
     store_dataset_bin(data_filename, data_points)
-    store_dataset_bin(label_filename, labels)
+    store_dataset_bin(label_filename, labels.astype(np.float32))
 
-def write_string(outfile, string):
+# The same few keys and values are written to every Balsa file, so their
+# encoding is cached.
+@functools.lru_cache(maxsize=64)
+def encode_string(string):
 
     raw_string = string.encode("ascii")
     assert len(raw_string) < 256
-    outfile.write(struct.pack(f"<B{len(raw_string)}s", len(raw_string), raw_string))
+    return BALSA_SIZE.pack(len(raw_string)) + raw_string
+
+def write_string(outfile, string):
+
+    outfile.write(encode_string(string))
 
 def write_kv_pair(outfile, key, value, value_type):
 
-    if value_type == "strn":
+    raw_value_type = value_type.encode("ascii")
+
+    if raw_value_type == b"strn":
         write_string(outfile, key)
-        outfile.write(b"strn")
+        outfile.write(raw_value_type)
         write_string(outfile, value)
         return
 
-    if value_type == "ui08":
-        fmt = "<B"
-    elif value_type == "ui32":
-        fmt = "<I"
-    elif value_type == "fl32":
-        fmt = "<f"
-    elif value_type == "fl64":
-        fmt = "<d"
-    else:
-        assert False
+    value_struct = BALSA_VALUE_TYPES.get(raw_value_type)
+    assert value_struct is not None
 
     write_string(outfile, key)
-    outfile.write(value_type.encode("ascii"))
-    outfile.write(struct.pack(fmt, value))
+    outfile.write(raw_value_type)
+    outfile.write(value_struct.pack(value))
 
 def store_dataset_balsa(filename, dataset):
 
     assert dataset.ndim == 1 or dataset.ndim == 2
-    assert dataset.dtype == np.float32
+    assert dataset.dtype in BALSA_SCALAR_TYPE_IDS
 
     num_rows, num_columns = (*dataset.shape, 1)[:2]
-    with open(filename, "wb") as outfile:
 
-        # Write file signature.
-        outfile.write(b"blsa")
+    # Assemble the headers in memory, such that they are written to the file
+    # in a single write.
+    header = io.BytesIO()
+
+    # Write file signature.
+    header.write(b"blsa")
 
-        # Write endianness marker.
-        outfile.write(b"lend")
+    # Write endianness marker.
+    header.write(b"lend")
 
-        # Write file header dictionary.
-        outfile.write(b"dict")
-        outfile.write(struct.pack("<B", 2))
-        write_kv_pair(outfile, "file_major_version", 1, "ui08")
-        write_kv_pair(outfile, "file_minor_version", 0, "ui08")
-        outfile.write(b"tcid")
+    # Write file header dictionary.
+    header.write(b"dict")
+    header.write(BALSA_SIZE.pack(2))
+    write_kv_pair(header, "file_major_version", 1, "ui08")
+    write_kv_pair(header, "file_minor_version", 0, "ui08")
+    header.write(b"tcid")
 
-        # Write table start marker.
-        outfile.write(b"tabl")
+    # Write table start marker.
+    header.write(b"tabl")
 
-        # Write table header dictionary.
-        outfile.write(b"dict")
-        outfile.write(struct.pack("<B", 3))
-        write_kv_pair(outfile, "row_count", num_rows, "ui32")
-        write_kv_pair(outfile, "column_count", num_columns, "ui32")
-        write_kv_pair(outfile, "scalar_type_id", "fl32", "strn")
-        outfile.write(b"tcid")
+    # Write table header dictionary.
+    header.write(b"dict")
+    header.write(BALSA_SIZE.pack(3))
+    write_kv_pair(header, "row_count", num_rows, "ui32")
+    write_kv_pair(header, "column_count", num_columns, "ui32")
+    write_kv_pair(header, "scalar_type_id", BALSA_SCALAR_TYPE_IDS[dataset.dtype], "strn")
+    header.write(b"tcid")
+
+    with open(filename, "wb") as outfile:
+
+        outfile.write(header.getbuffer())
 
         # Write table elements.
-        for i in range(num_rows):
-            outfile.write(dataset[i].tobytes())
+        np.ascontiguousarray(dataset).tofile(outfile)
 
         # Write table end marker.
         outfile.write(b"lbat")
@@ -230,9 +369,10 @@ def store_dataset_balsa(filename, dataset):
 def store_labelled_dataset_balsa(data_filename, label_filename, data_points, labels):
 
     assert data_points.ndim == 2 and data_points.dtype == np.float32
-    assert labels.ndim == 1 and labels.dtype == np.float32
+    assert labels.ndim == 1 and labels.dtype == np.uint8
     assert len(data_points) == len(labels)
 
+    # Balsa converts the 8-bit labels to its internal label type on load.
     store_dataset_balsa(data_filename, data_points)
     store_dataset_balsa(label_filename, labels)
 
@@ -253,6 +393,9 @@ def store_labelled_dataset(data_format, data_filename, label_filename, data_poin
     else:
         raise RuntimeError("Unsupported data format: " + str(data_format) + ".")
 
+# The filenames only depend on the arguments and the cache directory, which
+# clears the cache when it is changed.
+@functools.lru_cache(maxsize=None)
 def get_dataset_filenames(purpose, data_format, data_size, test_percentage):
 
     suffix = "." + data_format
@@ -260,9 +403,10 @@ def get_dataset_filenames(purpose, data_format, data_size, test_percentage):
         suffix = "-oob-" + str(test_percentage) + suffix
     if data_size is not None:
         suffix = "-" + str(data_size) + suffix
-    data_file = pathlib.Path(CACHE_DIR / (purpose + "-data" + suffix)).absolute()
-    label_file = pathlib.Path(CACHE_DIR / (purpose + "-label" + suffix)).absolute()
-    return (data_file, None) if data_format == "csv" else (data_file, label_file)
+    data_file = CACHE_DIR / (purpose + "-data" + suffix)
+    if data_format == "csv":
+        return data_file, None
+    return data_file, CACHE_DIR / (purpose + "-label" + suffix)
 
 def get_train_dataset_filenames(data_format, data_size, test_percentage=None):
 
@@ -272,25 +416,41 @@ def get_test_dataset_filenames(data_format, data_size=None, test_percentage=None
 
     return get_dataset_filenames("test", data_format, data_size, test_percentage)
 
-def is_cached(data_size, test_percentage):
+def get_test_size(data_size, test_percentage):
 
-    for data_format in DATA_FORMATS:
+    return 0 if test_percentage is None else round(test_percentage * data_size / 100.0)
+
+def get_cache_inventory():
+
+    # List the cache directory once, instead of checking every file separately.
+    try:
+        with os.scandir(CACHE_DIR) as entries:
+            return frozenset(entry.name for entry in entries if entry.is_file())
+    except FileNotFoundError:
+        return frozenset()
+
+def is_cached(data_size, test_percentage, data_formats=DATA_FORMATS, inventory=None):
+
+    if inventory is None:
+        inventory = get_cache_inventory()
+
+    for data_format in data_formats:
         filenames = get_train_dataset_filenames(data_format, data_size, test_percentage)
         if test_percentage is not None:
             filenames += get_test_dataset_filenames(data_format, data_size, test_percentage)
         for filename in filenames:
-            if filename is not None and not filename.is_file():
+            if filename is not None and filename.name not in inventory:
                 return False
     return True
 
-def remove_from_cache(data_size, test_percentage):
+def remove_from_cache(data_size, test_percentage, inventory=None):
 
     for data_format in DATA_FORMATS:
         filenames = get_train_dataset_filenames(data_format, data_size, test_percentage)
         if test_percentage is not None:
             filenames += get_test_dataset_filenames(data_format, data_size, test_percentage)
         for filename in filenames:
-            if filename is not None:
+            if filename is not None and (inventory is None or filename.name in inventory):
                 filename.unlink(missing_ok=True)
 
 def sample_dataset(data_points, labels, data_size, *, random_generator=None, replace=False):
@@ -304,53 +464,144 @@ def sample_dataset(data_points, labels, data_size, *, random_generator=None, rep
     index = random_generator.choice(len(data_points), data_size, replace=replace)
     return data_points[index], labels[index]
 
-def generate_datasets(train_data_filename, data_sizes, *, use_cache=True, test_percentage=None, seed=None):
+def generate_datasets(train_data_filename, data_sizes, *, use_cache=True, test_percentage=None, seed=None,
+                      data_formats=DATA_FORMATS, num_jobs=1):
 
     random_generator = np.random.default_rng(seed)
 
-    data_points, labels = None, None
-    for data_size in data_sizes:
-
-        in_cache = is_cached(data_size, test_percentage)
-
-        if in_cache and use_cache and seed is None:
-            print("\033[32m" + f"{data_size} [cached]" + "\033[0m")
-            continue
-
-        if in_cache:
-            print("\033[32m" + f"{data_size} [forced]" + "\033[0m")
-        else:
-            print("\033[32m" + f"{data_size}" + "\033[0m")
-
-        remove_from_cache(data_size, test_percentage)
-
-        if data_points is None:
-            assert labels is None
-            data_points, labels = load_labelled_dataset_json(train_data_filename)
-
-            unique_labels = np.unique(labels)
-            if not np.array_equal(unique_labels, [0.0, 1.0]):
-                raise ValueError(f"rfcperf currently only supports binary classification "
-                             f"(labels 0 and 1). Found labels: {unique_labels}")
-
-        test_size = 0 if test_percentage is None else round(test_percentage * data_size / 100.0)
-        new_data_points, new_labels = sample_dataset(data_points, labels, data_size + test_size, random_generator=random_generator)
-
-        for data_format in DATA_FORMATS:
-            train_data_filename, train_label_filename = get_train_dataset_filenames(data_format, data_size, test_percentage)
-            store_labelled_dataset(data_format, train_data_filename, train_label_filename, new_data_points[:data_size], new_labels[:data_size])
-
-        if test_percentage is None:
-            continue
+    # Datasets are always sampled here, in order, such that the samples do not
+    # depend on the number of jobs. Storing the samples, which is the expensive
+    # part, is optionally handed off to a pool of worker processes. Filenames
+    # are determined here, because workers do not share the cache directory.
+    with contextlib.ExitStack() as stack:
+
+        executor = None
+        if num_jobs > 1:
+            executor = stack.enter_context(concurrent.futures.ProcessPoolExecutor(max_workers=num_jobs))
+        futures = []
+
+        def store(*args):
+            if executor is None:
+                store_labelled_dataset(*args)
+            else:
+                futures.append(executor.submit(store_labelled_dataset, *args))
+
+        # The datasets of each data size are only written after they have been
+        # checked, so the inventory of the cache can be taken once up front.
+        inventory = get_cache_inventory()
+
+        data_points, labels = None, None
+        for data_size in data_sizes:
+
+            in_cache = is_cached(data_size, test_percentage, data_formats, inventory)
+
+            if in_cache and use_cache and seed is None:
+                print_colored("green", f"{data_size} [cached]")
+                continue
+
+            # If the datasets are in the cache in some other format, convert them
+            # instead of drawing a new sample, which would replace the datasets
+            # of all formats. Only "bin" and "balsa" datasets can be loaded.
+            source_format = None
+            if use_cache and seed is None:
+                source_format = next((data_format for data_format in ("bin", "balsa")
+                                      if is_cached(data_size, test_percentage, (data_format,), inventory)), None)
+
+            if source_format is not None:
+                print_colored("green", f"{data_size} [converted]")
+                for get_filenames in (get_train_dataset_filenames, get_test_dataset_filenames):
+                    if get_filenames is get_test_dataset_filenames and test_percentage is None:
+                        continue
+                    dataset = load_labelled_dataset_cached(source_format, *get_filenames(source_format, data_size, test_percentage))
+                    for data_format in data_formats:
+                        if not is_cached(data_size, test_percentage, (data_format,), inventory):
+                            store(data_format, *get_filenames(data_format, data_size, test_percentage), *dataset)
+                continue
+
+            if in_cache:
+                print_colored("green", f"{data_size} [forced]")
+            else:
+                print_colored("green", data_size)
+
+            # All formats are removed, such that datasets in different formats that
+            # are in the cache at the same time are always the same sample.
+            remove_from_cache(data_size, test_percentage, inventory)
+
+            if data_points is None:
+                assert labels is None
+                data_points, labels = load_labelled_dataset(train_data_filename)
+
+                # Count the labels in a single pass instead of sorting them,
+                # which np.unique() would do.
+                label_counts = np.bincount(labels)
+                if len(label_counts) != 2 or not label_counts.all():
+                    raise ValueError(f"rfcperf currently only supports binary classification "
+                                 f"(labels 0 and 1). Found labels: {np.flatnonzero(label_counts)}")
+
+                # Draw a single sample that is large enough for every data size,
+                # instead of one sample per data size. Each data size uses a
+                # prefix of it, which is a uniform sample without replacement of
+                # the requested size as well.
+                max_sample_size = max(size + get_test_size(size, test_percentage) for size in data_sizes)
+                assert max_sample_size <= len(data_points)
+                index = random_generator.choice(len(data_points), max_sample_size, replace=False)
+
+                # Gather the sample once. The datasets of each data size are
+                # views of it, instead of copies gathered for every data size.
+                sample_data_points, sample_labels = data_points[index], labels[index]
+
+            test_size = get_test_size(data_size, test_percentage)
+            new_data_points = sample_data_points[:data_size + test_size]
+            new_labels = sample_labels[:data_size + test_size]
+
+            for data_format in data_formats:
+                data_filename, label_filename = get_train_dataset_filenames(data_format, data_size, test_percentage)
+                store(data_format, data_filename, label_filename, new_data_points[:data_size], new_labels[:data_size])
+
+            if test_percentage is None:
+                continue
+
+            for data_format in data_formats:
+                data_filename, label_filename = get_test_dataset_filenames(data_format, data_size, test_percentage)
+                store(data_format, data_filename, label_filename, new_data_points[data_size:], new_labels[data_size:])
+
+        # Propagate errors raised by the workers.
+        for future in futures:
+            future.result()
+
+def ingest_test_dataset(test_data_filename, data_formats=DATA_FORMATS, *, use_cache=True):
+
+    # The ingested test dataset is kept as long as it was ingested from the same
+    # file and that file has not been modified since.
+    test_data_filename = pathlib.Path(test_data_filename)
+    stat_result = test_data_filename.stat()
+    source = f"{test_data_filename.absolute()}:{stat_result.st_mtime_ns}:{stat_result.st_size}"
+    source_filename = CACHE_DIR / "test-source.txt"
+
+    def is_ingested(data_format):
+        return all(filename is None or filename.is_file() for filename in get_test_dataset_filenames(data_format))
+
+    same_source = use_cache and source_filename.is_file() and source_filename.read_text() == source
+    if same_source and all(is_ingested(data_format) for data_format in data_formats):
+        print_colored("green", f"{test_data_filename} [cached]")
+        return
 
+    # Unless the formats in the cache were ingested from the same file, remove
+    # all of them, such that no format ingested from another file is left
+    # behind. Otherwise, only the missing formats are added.
+    if not same_source:
+        source_filename.unlink(missing_ok=True)
         for data_format in DATA_FORMATS:
-            test_data_filename, test_label_filename = get_test_dataset_filenames(data_format, data_size, test_percentage)
-            store_labelled_dataset(data_format, test_data_filename, test_label_filename, new_data_points[data_size:], new_labels[data_size:])
+            for filename in get_test_dataset_filenames(data_format):
+                if filename is not None:
+                    filename.unlink(missing_ok=True)
 
-def ingest_test_dataset(test_data_filename):
+    data_points, labels = load_labelled_dataset(test_data_filename)
 
-    data_points, labels = load_labelled_dataset_json(test_data_filename)
+    for data_format in data_formats:
+        if same_source and is_ingested(data_format):
+            continue
+        data_filename, label_filename = get_test_dataset_filenames(data_format)
+        store_labelled_dataset(data_format, data_filename, label_filename, data_points, labels)
 
-    for data_format in DATA_FORMATS:
-        test_data_filename, test_label_filename = get_test_dataset_filenames(data_format)
-        store_labelled_dataset(data_format, test_data_filename, test_label_filename, data_points, labels)
+    source_filename.write_text(source)
@@ -1,6 +1,6 @@
 import pathlib
 
-from ..data import load_dataset_balsa
+from ..data import load_dataset_balsa, load_labels
 from ..util import run_program, get_statistics_from_time_file, \
                    get_statistics_from_stdout, get_classification_scores
 
@@ -19,6 +19,10 @@ class Driver:
 
         return "balsa"
 
+    def prepare(self, train_data_filename, train_label_filename, *, random_seed):
+
+        pass
+
     def run(self, run_path, train_data_filename, train_label_filename, test_data_filename, test_label_filename, *,
             num_estimators, random_seed, max_tree_depth, num_features, num_threads):
 
@@ -42,7 +46,8 @@ class Driver:
         get_statistics_from_stdout(result.stdout, target_dict=run_statistics, key_prefix="test-")
 
         balsa_label_filename = run_path / (test_data_filename.stem + "-predictions.balsa")
-        labels, predicted_labels = load_dataset_balsa(test_label_filename), load_dataset_balsa(balsa_label_filename)
+        labels = load_labels("balsa", test_data_filename, test_label_filename)
+        predicted_labels = load_dataset_balsa(balsa_label_filename)
 
         get_classification_scores(predicted_labels, labels, target_dict=run_statistics, key_prefix="test-")
 
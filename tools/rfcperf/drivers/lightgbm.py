@@ -1,61 +1,44 @@
-import pathlib
+from ..config import parse_boolean
+from ..util import run_program
+from .script import PACKAGE_DATA_PATH, ScriptDriver
 
-from ..data import load_dataset_bin
-from ..util import run_program, get_statistics_from_time_file, \
-                   get_statistics_from_stdout, get_classification_scores
+class Driver(ScriptDriver):
 
-PACKAGE_DATA_PATH = pathlib.Path(__file__).parent.parent.absolute() / "scripts"
+    name = "lightgbm"
 
-class Driver:
+    def __init__(self, python, dataset_cache="no"):
 
-    def __init__(self, python):
-
-        self.python = pathlib.Path(python)
+        super().__init__(python)
+        self.dataset_cache = parse_boolean(dataset_cache)
 
     @staticmethod
     def add_default_config(config):
 
-        config.add_classifier("lightgbm", driver="lightgbm", python="/path/to/python/interpreter")
-
-    def get_data_format(self):
-
-        return "bin"
+        config.add_classifier("lightgbm", driver="lightgbm", python="/path/to/python/interpreter", dataset_cache="no")
 
-    def run(self, run_path, train_data_filename, train_label_filename, test_data_filename, test_label_filename, *,
-            num_estimators, random_seed, max_tree_depth, num_features, num_threads):
-
-        train_script = PACKAGE_DATA_PATH / "lightgbm-train.py"
-        test_script = PACKAGE_DATA_PATH / "lightgbm-test.py"
-
-        run_statistics = {}
+    # The binning depends on the random seed, so a binned dataset is stored for
+    # each seed it is used with.
+    @staticmethod
+    def get_binary_dataset_filename(train_data_filename, random_seed):
 
-        args = [str(train_script), "-e", str(num_estimators), "-t", str(num_threads)]
-        if random_seed is not None:
-            args += ["-s", str(random_seed)]
-        if max_tree_depth is not None:
-            args += ["-d", str(max_tree_depth)]
-        if num_features is not None:
-            args += ["-f", str(num_features)]
-        args += [str(train_data_filename), str(train_label_filename), "lightgbm.model"]
+        if random_seed is None:
+            return train_data_filename.with_suffix(".lgb")
+        return train_data_filename.with_suffix(f".s{random_seed}.lgb")
 
-        result = run_program(self.python, *args, log=True, log_prefix="lightgbm-train", time_file="train.time", cwd=run_path)
-        get_statistics_from_time_file(run_path / "train.time", target_dict=run_statistics, key_prefix="train-")
-        get_statistics_from_stdout(result.stdout, target_dict=run_statistics, key_prefix="train-")
+    # The binned dataset is constructed and stored here, outside of the
+    # measured train run, and is only loaded by the train script.
+    def prepare(self, train_data_filename, train_label_filename, *, random_seed):
 
-        result = run_program(self.python,
-                             str(test_script),
-                             "lightgbm.model",
-                             str(test_data_filename),
-                             "labels.bin",
-                             log=True,
-                             log_prefix="lightgbm-test",
-                             time_file="test.time",
-                             cwd=run_path)
-        get_statistics_from_time_file(run_path / "test.time", target_dict=run_statistics, key_prefix="test-")
-        get_statistics_from_stdout(result.stdout, target_dict=run_statistics, key_prefix="test-")
+        if self.dataset_cache:
+            args = [str(PACKAGE_DATA_PATH / "lightgbm-dataset.py")]
+            if random_seed is not None:
+                args += ["-s", str(random_seed)]
+            binary_dataset_filename = self.get_binary_dataset_filename(train_data_filename, random_seed)
+            args += [str(train_data_filename), str(train_label_filename), str(binary_dataset_filename)]
+            run_program(self.python, *args)
 
-        labels = load_dataset_bin(test_label_filename)
-        predicted_labels = load_dataset_bin(run_path / "labels.bin")
-        get_classification_scores(predicted_labels, labels, target_dict=run_statistics, key_prefix="test-")
+    def get_train_args(self, train_data_filename, random_seed):
 
-        return run_statistics
+        if self.dataset_cache:
+            return ["-b", str(self.get_binary_dataset_filename(train_data_filename, random_seed))]
+        return []
@@ -1,7 +1,7 @@
-import csv
 import numpy as np
 import pathlib
 
+from ..data import load_labels
 from ..util import run_program, get_statistics_from_time_file, \
                    get_statistics_from_stdout, get_classification_scores
 
@@ -20,6 +20,10 @@ class Driver:
 
         return "csv"
 
+    def prepare(self, train_data_filename, train_label_filename, *, random_seed):
+
+        pass
+
     def run(self, run_path, train_data_filename, train_label_filename, test_data_filename, test_label_filename, *,
             num_estimators, random_seed, max_tree_depth, num_features, num_threads):
 
@@ -58,13 +62,9 @@ class Driver:
 
         with open(run_path / "ranger_out.prediction", "r") as infile:
             assert infile.readline().startswith("Predictions")
-            predicted_labels = [int(line) for line in infile]
+            predicted_labels = np.loadtxt(infile, dtype=np.int8, ndmin=1)
 
-        with open(test_data_filename, "r") as infile:
-            reader = csv.reader(infile)
-            headers = next(reader, None)
-            assert headers[-1] == "label"
-            labels = [int(row[-1]) for row in reader]
+        labels = load_labels("csv", test_data_filename, test_label_filename)
 
         assert len(labels) == len(predicted_labels)
 
@@ -0,0 +1,70 @@
+import pathlib
+
+from ..data import load_dataset_bin, load_labels
+from ..util import run_program, get_statistics_from_time_file, \
+                   get_statistics_from_stdout, get_classification_scores
+
+PACKAGE_DATA_PATH = pathlib.Path(__file__).parent.parent.absolute() / "scripts"
+
+# Base class of drivers for classifiers that are run through a pair of Python
+# scripts ("<name>-train.py" and "<name>-test.py"), which read and write the
+# "bin" format. Derived classes set the name and may add script arguments, and
+# may prepare the training datasets before any run is measured.
+class ScriptDriver:
+
+    name = None
+
+    def __init__(self, python):
+
+        self.python = pathlib.Path(python)
+        self.train_script = str(PACKAGE_DATA_PATH / f"{self.name}-train.py")
+        self.test_script = str(PACKAGE_DATA_PATH / f"{self.name}-test.py")
+
+    def get_data_format(self):
+
+        return "bin"
+
+    def get_train_args(self, train_data_filename, random_seed):
+
+        return []
+
+    def get_test_args(self, num_threads):
+
+        return []
+
+    def prepare(self, train_data_filename, train_label_filename, *, random_seed):
+
+        pass
+
+    def run(self, run_path, train_data_filename, train_label_filename, test_data_filename, test_label_filename, *,
+            num_estimators, random_seed, max_tree_depth, num_features, num_threads):
+
+        model_filename = f"{self.name}.model"
+
+        run_statistics = {}
+
+        args = [self.train_script, "-e", str(num_estimators), "-t", str(num_threads)]
+        if random_seed is not None:
+            args += ["-s", str(random_seed)]
+        if max_tree_depth is not None:
+            args += ["-d", str(max_tree_depth)]
+        if num_features is not None:
+            args += ["-f", str(num_features)]
+        args += self.get_train_args(train_data_filename, random_seed)
+        args += [str(train_data_filename), str(train_label_filename), model_filename]
+
+        result = run_program(self.python, *args, log=True, log_prefix=f"{self.name}-train", time_file="train.time", cwd=run_path)
+        get_statistics_from_time_file(run_path / "train.time", target_dict=run_statistics, key_prefix="train-")
+        get_statistics_from_stdout(result.stdout, target_dict=run_statistics, key_prefix="train-")
+
+        args = [self.test_script, *self.get_test_args(num_threads), model_filename, str(test_data_filename), "labels.bin"]
+
+        result = run_program(self.python, *args, log=True, log_prefix=f"{self.name}-test", time_file="test.time", cwd=run_path)
+        get_statistics_from_time_file(run_path / "test.time", target_dict=run_statistics, key_prefix="test-")
+        get_statistics_from_stdout(result.stdout, target_dict=run_statistics, key_prefix="test-")
+
+        labels = load_labels("bin", test_data_filename, test_label_filename)
+        predicted_labels = load_dataset_bin(run_path / "labels.bin")
+        get_classification_scores(predicted_labels, labels, target_dict=run_statistics, key_prefix="test-")
+
+        return run_statistics
@@ -1,61 +1,25 @@
-import pathlib
+from .script import ScriptDriver
 
-from ..data import load_dataset_bin
-from ..util import run_program, get_statistics_from_time_file, \
-                   get_statistics_from_stdout, get_classification_scores
+class Driver(ScriptDriver):
 
-PACKAGE_DATA_PATH = pathlib.Path(__file__).parent.parent.absolute() / "scripts"
+    name = "sklearn"
 
-class Driver:
+    def __init__(self, python, ccp_alpha="0.0"):
 
-    def __init__(self, python):
-
-        self.python = pathlib.Path(python)
+        super().__init__(python)
+        self.ccp_alpha = float(ccp_alpha)
 
     @staticmethod
     def add_default_config(config):
 
-        config.add_classifier("sklearn", driver="sklearn", python="/path/to/python/interpreter")
-
-    def get_data_format(self):
-
-        return "bin"
-
-    def run(self, run_path, train_data_filename, train_label_filename, test_data_filename, test_label_filename, *,
-            num_estimators, random_seed, max_tree_depth, num_features, num_threads):
-
-        train_script = PACKAGE_DATA_PATH / "sklearn-train.py"
-        test_script = PACKAGE_DATA_PATH / "sklearn-test.py"
-
-        run_statistics = {}
-
-        args = [str(train_script), "-e", str(num_estimators), "-t", str(num_threads)]
-        if random_seed is not None:
-            args += ["-s", str(random_seed)]
-        if max_tree_depth is not None:
-            args += ["-d", str(max_tree_depth)]
-        if num_features is not None:
-            args += ["-f", str(num_features)]
-        args += [str(train_data_filename), str(train_label_filename), "sklearn.model"]
+        config.add_classifier("sklearn", driver="sklearn", python="/path/to/python/interpreter", ccp_alpha="0.0")
 
-        result = run_program(self.python, *args, log=True, log_prefix="sklearn-train", time_file="train.time", cwd=run_path)
-        get_statistics_from_time_file(run_path / "train.time", target_dict=run_statistics, key_prefix="train-")
-        get_statistics_from_stdout(result.stdout, target_dict=run_statistics, key_prefix="train-")
+    def get_train_args(self, train_data_filename, random_seed):
 
-        result = run_program(self.python,
-                             str(test_script),
-                             "sklearn.model",
-                             str(test_data_filename),
-                             "labels.bin",
-                             log=True,
-                             log_prefix="sklearn-test",
-                             time_file="test.time",
-                             cwd=run_path)
-        get_statistics_from_time_file(run_path / "test.time", target_dict=run_statistics, key_prefix="test-")
-        get_statistics_from_stdout(result.stdout, target_dict=run_statistics, key_prefix="test-")
+        if self.ccp_alpha > 0.0:
+            return ["-a", str(self.ccp_alpha)]
+        return []
 
-        labels = load_dataset_bin(test_label_filename)
-        predicted_labels = load_dataset_bin(run_path / "labels.bin")
-        get_classification_scores(predicted_labels, labels, target_dict=run_statistics, key_prefix="test-")
+    def get_test_args(self, num_threads):
 
-        return run_statistics
+        return ["-t", str(num_threads)]
@@ -1,21 +1,33 @@
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 
-def write_statistic(report, statistics, title, y_axis_label, *, key=None, getter_func=dict.get):
+# Figures are created directly instead of through pyplot, which keeps track of
+# all open figures and selects an interactive backend.
+def write_statistic(report, statistics, data_sizes, title, y_axis_label, *, key=None, getter_func=dict.get):
 
-    plt.figure()
-    plt.title(title)
-    plt.xlabel("No. of samples")
-    plt.ylabel(y_axis_label)
+    figure = Figure()
+    axes = figure.subplots()
+    axes.set_title(title)
+    axes.set_xlabel("No. of samples")
+    axes.set_ylabel(y_axis_label)
     plot_empty = True
     for classifier_name, classifier_statistics in statistics.items():
-        x_values = [run_statistics["data_size"] for run_statistics in classifier_statistics]
         y_values = [getter_func(run_statistics, key) for run_statistics in classifier_statistics]
-        plt.plot(x_values, y_values, linestyle="-", marker=".", label=classifier_name)
+        axes.plot(data_sizes[classifier_name], y_values, linestyle="-", marker=".", label=classifier_name)
         plot_empty = False
     if not plot_empty:
-        plt.legend()
-    plt.savefig(report, format="pdf")
-    plt.close()
+        axes.legend()
+    report.savefig(figure)
+
+# Getters for statistics that are derived from the statistics of a run. The key
+# is the prefix of the statistics ("train-" or "test-"), respectively the key of
+# the statistic to convert.
+def get_cpu_time(run_statistics, key_prefix):
+
+    return run_statistics[key_prefix + "user-time"] + run_statistics[key_prefix + "system-time"]
+
+def get_max_rss_in_gb(run_statistics, key):
+
+    return run_statistics[key] / 1_000_000
 
 def write_report(report_filename, num_threads, statistics):
 
@@ -23,30 +35,34 @@ def write_report(report_filename, num_threads, statistics):
 
     report = PdfPages(report_filename)
 
-    write_statistic(report, statistics, f"Wall Clock Time (Train) :: {num_threads} thread(s)", "Time (s)", key="train-wall-clock-time")
-    write_statistic(report, statistics, f"CPU Time (Train) :: {num_threads} thread(s)", "Time (s)", getter_func=lambda d, _: d["train-user-time"] + d["train-system-time"])
-    write_statistic(report, statistics, f"Percent CPU (Train) :: {num_threads} thread(s)", "%", key="train-percent-cpu")
-    write_statistic(report, statistics, f"Maximum RSS (Train) :: {num_threads} thread(s)", "RSS (GB)", getter_func=lambda d, _: d["train-max-rss"] / 1_000_000)
-    write_statistic(report, statistics, f"Data Load Wall Clock Time", "Time (s)", key="train-data-load-time")
-    write_statistic(report, statistics, f"Training Wall Clock Time", "Time (s)", key="train-training-time")
-    write_statistic(report, statistics, f"Model Store Wall Clock Time", "Time (s)", key="train-model-store-time")
-    write_statistic(report, statistics, f"Maximum Node Count", "No. of nodes", key="train-max-node-count")
-    write_statistic(report, statistics, f"Maximum Tree Depth", "Levels", key="train-max-tree-depth")
-
-    write_statistic(report, statistics, f"Wall Clock Time (Test) :: {num_threads} thread(s)", "Time (s)", key="test-wall-clock-time")
-    write_statistic(report, statistics, f"CPU Time (Test) :: {num_threads} thread(s)", "Time (s)", getter_func=lambda d, _: d["test-user-time"] + d["test-system-time"])
-    write_statistic(report, statistics, f"Percent CPU (Test) :: {num_threads} thread(s)", "%", key="test-percent-cpu")
-    write_statistic(report, statistics, f"Maximum RSS (Test) :: {num_threads} thread(s)", "RSS (GB)", getter_func=lambda d, _: d["test-max-rss"] / 1_000_000)
-    write_statistic(report, statistics, f"Model Load Wall Clock Time", "Time (s)", key="test-model-load-time")
-    write_statistic(report, statistics, f"Data Load Wall Clock Time", "Time (s)", key="test-data-load-time")
-    write_statistic(report, statistics, f"Classification Wall Clock Time", "Time (s)", key="test-classification-time")
-    write_statistic(report, statistics, f"Label Store Wall Clock Time", "Time (s)", key="test-label-store-time")
-    write_statistic(report, statistics, f"Diagnostic Odds Ratio", "DOR", key="test-dor")
-    write_statistic(report, statistics, f"P4-metric", "P4-metric", key="test-P4-metric")
-    write_statistic(report, statistics, f"Accuracy", "Accuracy", key="test-accuracy")
-    write_statistic(report, statistics, f"Positive Predictive Value", "PPV", key="test-ppv")
-    write_statistic(report, statistics, f"True Positive Rate", "True Positive Rate", key="test-tpr")
-    write_statistic(report, statistics, f"True Negative Rate", "True Negative Rate", key="test-tnr")
-    write_statistic(report, statistics, f"Negative Predictive Value", "NPV", key="test-npv")
+    # The data sizes are the x values of every plot.
+    data_sizes = {classifier_name: [run_statistics["data_size"] for run_statistics in classifier_statistics]
+                  for classifier_name, classifier_statistics in statistics.items()}
+
+    write_statistic(report, statistics, data_sizes, f"Wall Clock Time (Train) :: {num_threads} thread(s)", "Time (s)", key="train-wall-clock-time")
+    write_statistic(report, statistics, data_sizes, f"CPU Time (Train) :: {num_threads} thread(s)", "Time (s)", key="train-", getter_func=get_cpu_time)
+    write_statistic(report, statistics, data_sizes, f"Percent CPU (Train) :: {num_threads} thread(s)", "%", key="train-percent-cpu")
+    write_statistic(report, statistics, data_sizes, f"Maximum RSS (Train) :: {num_threads} thread(s)", "RSS (GB)", key="train-max-rss", getter_func=get_max_rss_in_gb)
+    write_statistic(report, statistics, data_sizes, f"Data Load Wall Clock Time", "Time (s)", key="train-data-load-time")
+    write_statistic(report, statistics, data_sizes, f"Training Wall Clock Time", "Time (s)", key="train-training-time")
+    write_statistic(report, statistics, data_sizes, f"Model Store Wall Clock Time", "Time (s)", key="train-model-store-time")
+    write_statistic(report, statistics, data_sizes, f"Maximum Node Count", "No. of nodes", key="train-max-node-count")
+    write_statistic(report, statistics, data_sizes, f"Maximum Tree Depth", "Levels", key="train-max-tree-depth")
+
+    write_statistic(report, statistics, data_sizes, f"Wall Clock Time (Test) :: {num_threads} thread(s)", "Time (s)", key="test-wall-clock-time")
+    write_statistic(report, statistics, data_sizes, f"CPU Time (Test) :: {num_threads} thread(s)", "Time (s)", key="test-", getter_func=get_cpu_time)
+    write_statistic(report, statistics, data_sizes, f"Percent CPU (Test) :: {num_threads} thread(s)", "%", key="test-percent-cpu")
+    write_statistic(report, statistics, data_sizes, f"Maximum RSS (Test) :: {num_threads} thread(s)", "RSS (GB)", key="test-max-rss", getter_func=get_max_rss_in_gb)
+    write_statistic(report, statistics, data_sizes, f"Model Load Wall Clock Time", "Time (s)", key="test-model-load-time")
+    write_statistic(report, statistics, data_sizes, f"Data Load Wall Clock Time", "Time (s)", key="test-data-load-time")
+    write_statistic(report, statistics, data_sizes, f"Classification Wall Clock Time", "Time (s)", key="test-classification-time")
+    write_statistic(report, statistics, data_sizes, f"Label Store Wall Clock Time", "Time (s)", key="test-label-store-time")
+    write_statistic(report, statistics, data_sizes, f"Diagnostic Odds Ratio", "DOR", key="test-dor")
+    write_statistic(report, statistics, data_sizes, f"P4-metric", "P4-metric", key="test-P4-metric")
+    write_statistic(report, statistics, data_sizes, f"Accuracy", "Accuracy", key="test-accuracy")
+    write_statistic(report, statistics, data_sizes, f"Positive Predictive Value", "PPV", key="test-ppv")
+    write_statistic(report, statistics, data_sizes, f"True Positive Rate", "True Positive Rate", key="test-tpr")
+    write_statistic(report, statistics, data_sizes, f"True Negative Rate", "True Negative Rate", key="test-tnr")
+    write_statistic(report, statistics, data_sizes, f"Negative Predictive Value", "NPV", key="test-npv")
 
     report.close()
@@ -0,0 +1,48 @@
+import contextlib
+import numpy as np
+import struct
+import time
+
+# Functions shared by the scripts run by the drivers, which import this module
+# from the directory they are in.
+
+def load_dataset_bin(filename):
+
+    # The payload is read in full, such that the file I/O is part of the data
+    # load time, as it is for the other classifiers.
+    header_format = "<I"
+    header_size = struct.calcsize(header_format)
+    with open(filename, "rb") as infile:
+        num_columns, = struct.unpack(header_format, infile.read(header_size))
+        return np.fromfile(infile, "<f4").reshape(-1, num_columns)
+
+def store_dataset_bin(filename, dataset):
+
+    assert dataset.ndim == 1 or dataset.ndim == 2
+    assert dataset.dtype == np.float32
+
+    num_rows, num_columns = (*dataset.shape, 1)[:2]
+    with open(filename, "wb") as outfile:
+        outfile.write(struct.pack("<I", num_columns))
+        np.ascontiguousarray(dataset).tofile(outfile)
+
+def is_up_to_date(filename, *dependencies):
+
+    if not filename.is_file():
+        return False
+    mtime = filename.stat().st_mtime_ns
+    return all(dependency.stat().st_mtime_ns <= mtime for dependency in dependencies)
+
+# Measure the wall clock time of the enclosed block and store it (in seconds)
+# under the specified name, which is the name the time is printed with.
+@contextlib.contextmanager
+def measure_time(times, name):
+
+    start_time = time.perf_counter()
+    yield
+    times[name] = time.perf_counter() - start_time
+
+def print_times(times):
+
+    for name, value in times.items():
+        print(f"{name}:", value)
@@ -0,0 +1,56 @@
+import argparse
+import lightgbm as lgb
+import os
+import pathlib
+import tempfile
+
+from common import is_up_to_date, load_dataset_bin
+
+def main(data_filename, label_filename, binary_dataset_filename, random_seed):
+
+    # The binned dataset is only reconstructed if the dataset it is constructed
+    # from has been regenerated since it was stored.
+    if is_up_to_date(binary_dataset_filename, data_filename, label_filename):
+        return
+
+    data = load_dataset_bin(data_filename)
+    label = load_dataset_bin(label_filename)
+    assert label.shape == (data.shape[0], 1)
+    label.shape = (-1,)
+
+    # The parameters that affect binning are the ones the train script passes
+    # to LightGBM.
+    params = {"min_data_in_leaf": 1}
+    if random_seed is not None:
+        params["seed"] = random_seed
+        params["deterministic"] = True
+        params["force_row_wise"] = True
+    dataset = lgb.Dataset(data, label, params=params).construct()
+
+    # LightGBM does not overwrite an existing file, and concurrent runs may
+    # share the stored dataset, so it is stored under a unique name first and
+    # then moved into place.
+    with tempfile.TemporaryDirectory(dir=binary_dataset_filename.parent) as temp_path:
+        temp_filename = pathlib.Path(temp_path) / binary_dataset_filename.name
+        dataset.save_binary(str(temp_filename))
+        os.replace(temp_filename, binary_dataset_filename)
+
+def parse_command_line_arguments():
+
+    def positive_integer(text):
+        value = int(text)
+        if value <= 0:
+            raise ValueError
+        return value
+
+    parser = argparse.ArgumentParser(description="Construct and store a binned LightGBM dataset.")
+    parser.add_argument("data_filename", type=pathlib.Path, metavar="DATA_INPUT_FILE")
+    parser.add_argument("label_filename", type=pathlib.Path, metavar="LABEL_INPUT_FILE")
+    parser.add_argument("binary_dataset_filename", type=pathlib.Path, metavar="BINARY_DATASET_OUTPUT_FILE")
+    parser.add_argument("-s", "--random-seed", type=positive_integer)
+    return parser.parse_args()
+
+if __name__ == "__main__":
+
+    args = parse_command_line_arguments()
+    main(**dict(vars(args)))
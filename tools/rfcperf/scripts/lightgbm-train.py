@@ -2,18 +2,10 @@ import argparse
 import lightgbm as lgb
 import numpy as np
 import pathlib
-import struct
-import time
 
-def load_dataset_bin(filename):
+from common import is_up_to_date, load_dataset_bin, measure_time, print_times
 
-    header_format = "<I"
-    header_size = struct.calcsize(header_format)
-    with open(filename, "rb") as infile:
-        num_columns, = struct.unpack(header_format, infile.read(header_size))
-        dataset = np.frombuffer(infile.read(), "<f4")
-        dataset.shape = (-1, num_columns)
-    return dataset
+MAX_NUM_LEAVES = 4096
 
 def load_lgb_dataset(data_filename, label_filename):
 
@@ -22,14 +14,31 @@ def load_lgb_dataset(data_filename, label_filename):
     num_rows, num_columns = data.shape
     assert label.shape == (num_rows, 1)
     label.shape = (-1,)
-    return lgb.Dataset(data, label == 1.0), num_columns
 
-def main(data_filename, label_filename, model_filename, num_estimators, random_seed, max_tree_depth, num_features, num_threads):
+    # The labels are guaranteed to be 0.0 or 1.0 when the dataset is generated,
+    # which LightGBM accepts as is for the binary objective.
+    return lgb.Dataset(data, label), num_rows, num_columns
 
-    start_time = time.time()
-    train_set, num_data_features = load_lgb_dataset(data_filename, label_filename)
-    end_time = time.time()
-    data_load_time = end_time - start_time
+def load_lgb_binary_dataset(binary_dataset_filename):
+
+    dataset = lgb.Dataset(str(binary_dataset_filename)).construct()
+    return dataset, dataset.num_data(), dataset.num_feature()
+
+def main(data_filename, label_filename, model_filename, num_estimators, random_seed, max_tree_depth, num_features, num_threads,
+         binary_dataset_filename):
+
+    times = {}
+
+    # Use the binned dataset stored by lightgbm-dataset.py before this run,
+    # unless the dataset it was constructed from has been regenerated since.
+    use_binary_dataset = binary_dataset_filename is not None and \
+        is_up_to_date(binary_dataset_filename, data_filename, label_filename)
+
+    with measure_time(times, "Data Load Time"):
+        if use_binary_dataset:
+            train_set, num_data_points, num_data_features = load_lgb_binary_dataset(binary_dataset_filename)
+        else:
+            train_set, num_data_points, num_data_features = load_lgb_dataset(data_filename, label_filename)
 
     # Feature fraction is an unfortunate parameterization. It is unclear how the
     # number of features to consider is computed internally. Rounding or
@@ -39,13 +48,17 @@ def main(data_filename, label_filename, model_filename, num_estimators, random_s
         num_features = int(np.sqrt(num_data_features))
     feature_fraction_bynode = num_features / num_data_features
 
+    # A tree cannot have more leaves than there are data points, so there is no
+    # need to reserve (histogram) space for more leaves than that.
+    num_leaves = min(MAX_NUM_LEAVES, max(2, num_data_points))
+
     params = {
         "boosting_type": "gbdt",
         "objective": "binary",
         "metric": "binary_logloss",
         "num_trees": num_estimators,
         "learning_rate": 0.4,
-        "num_leaves": 4096,
+        "num_leaves": num_leaves,
         "tree_learner": "serial",
         "num_threads": num_threads,
         "max_depth": max_tree_depth,
@@ -58,19 +71,13 @@ def main(data_filename, label_filename, model_filename, num_estimators, random_s
         params["deterministic"] = True
         params["force_row_wise"] = True
 
-    start_time = time.time()
-    model = lgb.train(params, train_set)
-    end_time = time.time()
-    training_time = end_time - start_time
+    with measure_time(times, "Training Time"):
+        model = lgb.train(params, train_set)
 
-    start_time = time.time()
-    model.save_model(model_filename)
-    end_time = time.time()
-    model_store_time = end_time - start_time
+    with measure_time(times, "Model Store Time"):
+        model.save_model(model_filename)
 
-    print("Data Load Time:", data_load_time)
-    print("Training Time:", training_time)
-    print("Model Store Time:", model_store_time)
+    print_times(times)
 
 def parse_command_line_arguments():
 
@@ -89,6 +96,7 @@ def parse_command_line_arguments():
     parser.add_argument("-e", "--num-estimators", type=positive_integer, default="150")
     parser.add_argument("-t", "--num-threads", type=positive_integer, default="1")
     parser.add_argument("-s", "--random-seed", type=positive_integer)
+    parser.add_argument("-b", "--binary-dataset", type=pathlib.Path, metavar="BINARY_DATASET_FILE", dest="binary_dataset_filename")
     return parser.parse_args()
 
 if __name__ == "__main__":
@@ -1,66 +1,55 @@
 import argparse
+import joblib
 import numpy as np
 import pathlib
-import pickle
-import struct
-import sys
-import time
 
-def load_dataset_bin(filename):
+from common import load_dataset_bin, store_dataset_bin, measure_time, print_times
 
-    header_format = "<I"
-    header_size = struct.calcsize(header_format)
-    with open(filename, "rb") as infile:
-        num_columns, = struct.unpack(header_format, infile.read(header_size))
-        dataset = np.frombuffer(infile.read(), "<f4")
-        dataset.shape = (-1, num_columns)
-    return dataset
+def predict(random_forest, data_points, batch_size):
 
-def store_dataset_bin(filename, dataset):
+    # Classify the data points in batches, which bounds the size of the
+    # temporary arrays allocated by sklearn for each batch.
+    predicted_labels = np.empty(len(data_points), dtype=np.float32)
+    for start in range(0, len(data_points), batch_size):
+        end = start + batch_size
+        predicted_labels[start:end] = random_forest.predict(data_points[start:end])
+    return predicted_labels
 
-    assert dataset.ndim == 1 or dataset.ndim == 2
-    assert dataset.dtype == np.float32
+def main(model_filename, data_filename, label_filename, batch_size, num_threads):
 
-    num_rows, num_columns = (*dataset.shape, 1)[:2]
-    with open(filename, "wb") as outfile:
-        outfile.write(struct.pack("<I", num_columns))
-        for i in range(num_rows):
-            outfile.write(dataset[i].tobytes())
+    times = {}
 
-def main(model_filename, data_filename, label_filename):
+    with measure_time(times, "Model Load Time"):
+        random_forest = joblib.load(model_filename)
+        # The model stores the number of threads used for training, which need
+        # not match the number of threads requested for classification.
+        random_forest.n_jobs = num_threads
 
-    start_time = time.time()
-    with open(model_filename, "rb") as infile:
-        random_forest = pickle.load(infile)
-    end_time = time.time()
-    model_load_time = end_time - start_time
+    with measure_time(times, "Data Load Time"):
+        data_points = load_dataset_bin(data_filename)
 
-    start_time = time.time()
-    data_points = load_dataset_bin(data_filename)
-    end_time = time.time()
-    data_load_time = end_time - start_time
+    with measure_time(times, "Classification Time"):
+        predicted_labels = predict(random_forest, data_points, batch_size)
 
-    start_time = time.time()
-    predicted_labels = random_forest.predict(data_points)
-    end_time = time.time()
-    classification_time = end_time - start_time
+    with measure_time(times, "Label Store Time"):
+        store_dataset_bin(label_filename, predicted_labels)
 
-    start_time = time.time()
-    store_dataset_bin(label_filename, predicted_labels.astype(np.float32))
-    end_time = time.time()
-    label_store_time = end_time - start_time
-
-    print("Model Load Time:", model_load_time)
-    print("Data Load Time:", data_load_time)
-    print("Classification Time:", classification_time)
-    print("Label Store Time:", label_store_time)
+    print_times(times)
 
 def parse_command_line_arguments():
 
+    def positive_integer(text):
+        value = int(text)
+        if value <= 0:
+            raise ValueError
+        return value
+
     parser = argparse.ArgumentParser(description="Classify data using a pre-trained sklearn classifier.")
     parser.add_argument("model_filename", type=pathlib.Path, metavar="MODEL_INPUT_FILE")
     parser.add_argument("data_filename", type=pathlib.Path, metavar="DATA_INPUT_FILE")
     parser.add_argument("label_filename", type=pathlib.Path, metavar="LABEL_OUTPUT_FILE")
+    parser.add_argument("-b", "--batch-size", type=positive_integer, default="65536")
+    parser.add_argument("-t", "--num-threads", type=positive_integer, default="1")
     return parser.parse_args()
 
 if __name__ == "__main__":
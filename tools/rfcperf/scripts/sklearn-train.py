@@ -1,58 +1,44 @@
 import argparse
-import numpy as np
+import joblib
 import pathlib
-import pickle
-import struct
-import sys
-import time
 
 from sklearn.ensemble import RandomForestClassifier
 
-def load_dataset_bin(filename):
+from common import load_dataset_bin, measure_time, print_times
 
-    header_format = "<I"
-    header_size = struct.calcsize(header_format)
-    with open(filename, "rb") as infile:
-        num_columns, = struct.unpack(header_format, infile.read(header_size))
-        dataset = np.frombuffer(infile.read(), "<f4")
-        dataset.shape = (-1, num_columns)
-    return dataset
+def main(data_filename, label_filename, model_filename, num_estimators, random_seed, max_tree_depth, num_features, num_threads, ccp_alpha):
 
-def main(data_filename, label_filename, model_filename, num_estimators, random_seed, max_tree_depth, num_features, num_threads):
+    times = {}
 
-    start_time = time.time()
-    data_points = load_dataset_bin(data_filename)
-    labels = load_dataset_bin(label_filename)
-    end_time = time.time()
-    data_load_time = end_time - start_time
+    with measure_time(times, "Data Load Time"):
+        data_points = load_dataset_bin(data_filename)
+        labels = load_dataset_bin(label_filename)
 
-    start_time = time.time()
-    max_features = "sqrt" if num_features is None else num_features
-    random_forest = RandomForestClassifier(n_estimators=num_estimators,
-                                           n_jobs=num_threads,
-                                           random_state=random_seed,
-                                           max_depth=max_tree_depth,
-                                           max_features=max_features,
-                                           min_samples_leaf=1,
-                                           min_samples_split=2,
-                                           bootstrap=False)
-    assert labels.shape == (len(data_points), 1)
-    labels.shape = (-1,)
-    random_forest.fit(data_points, labels)
-    end_time = time.time()
-    training_time = end_time - start_time
+    with measure_time(times, "Training Time"):
+        max_features = "sqrt" if num_features is None else num_features
+        random_forest = RandomForestClassifier(n_estimators=num_estimators,
+                                               n_jobs=num_threads,
+                                               random_state=random_seed,
+                                               max_depth=max_tree_depth,
+                                               max_features=max_features,
+                                               min_samples_leaf=1,
+                                               min_samples_split=2,
+                                               bootstrap=False,
+                                               ccp_alpha=ccp_alpha)
+        assert labels.shape == (len(data_points), 1)
+        labels.shape = (-1,)
+        random_forest.fit(data_points, labels)
 
-    start_time = time.time()
-    with open(model_filename, "wb") as outf:
-        pickle.dump(random_forest, outf)
-    end_time = time.time()
-    model_store_time = end_time - start_time
+    with measure_time(times, "Model Store Time"):
+        joblib.dump(random_forest, model_filename)
 
-    print("Data Load Time:", data_load_time)
-    print("Training Time:", training_time)
-    print("Model Store Time:", model_store_time)
-    print("Maximum Depth:", max([estimator.get_depth() for estimator in random_forest.estimators_]))
-    print("Maximum Node Count:", max([estimator.tree_.node_count for estimator in random_forest.estimators_]))
+    print_times(times)
+
+    # Read the statistics of the fitted trees directly, instead of through the
+    # accessor methods of each estimator.
+    trees = [estimator.tree_ for estimator in random_forest.estimators_]
+    print("Maximum Depth:", max(tree.max_depth for tree in trees))
+    print("Maximum Node Count:", max(tree.node_count for tree in trees))
 
 def parse_command_line_arguments():
 
@@ -62,6 +48,12 @@ def parse_command_line_arguments():
             raise ValueError
         return value
 
+    def non_negative_float(text):
+        value = float(text)
+        if value < 0.0:
+            raise ValueError
+        return value
+
     parser = argparse.ArgumentParser(description="Train an sklearn classifier.")
     parser.add_argument("data_filename", type=pathlib.Path, metavar="DATA_INPUT_FILE")
     parser.add_argument("label_filename", type=pathlib.Path, metavar="LABEL_INPUT_FILE")
@@ -71,6 +63,7 @@ def parse_command_line_arguments():
     parser.add_argument("-e", "--num-estimators", type=positive_integer, default="150")
     parser.add_argument("-t", "--num-threads", type=positive_integer, default="1")
     parser.add_argument("-s", "--random-seed", type=positive_integer)
+    parser.add_argument("-a", "--ccp-alpha", type=non_negative_float, default="0.0")
     return parser.parse_args()
 
 if __name__ == "__main__":
@@ -1,10 +1,29 @@
+import contextlib
 import numpy as np
-import pathlib
-import re
-import subprocess
+import os
 import platform
+import re
 import shutil
-
+import subprocess
+import tempfile
+import threading
+
+# Statistics printed by the classifiers (or the scripts that wrap them), which
+# are matched anywhere in a line that ends with the value.
+STDOUT_STATISTICS = {
+    "Data Load Time": ("data-load-time", float),
+    "Model Load Time": ("model-load-time", float),
+    "Model Store Time": ("model-store-time", float),
+    "Training Time": ("training-time", float),
+    "Classification Time": ("classification-time", float),
+    "Label Store Time": ("label-store-time", float),
+    "Maximum Depth": ("max-tree-depth", int),
+    "Maximum Node Count": ("max-node-count", int)
+}
+STDOUT_STATISTICS_PATTERN = re.compile("(" + "|".join(map(re.escape, STDOUT_STATISTICS)) + r"):.*?(\S+)[^\S\n]*$", re.MULTILINE)
+
+# ANSI escape codes of the colors used for console output.
+COLORS = {"red": 31, "green": 32, "yellow": 33, "magenta": 35}
 
 def _get_time_command():
     """Return the GNU time command for the current platform."""
@@ -20,26 +39,112 @@ def _get_time_command():
 
 def run_program(program, *args, log=False, log_prefix=None, time_file=None, timeout=None, cwd=None):
 
+    program = os.fspath(program)
+    command = [program, *args]
+    log_path = "" if cwd is None else cwd
+
+    # The resource usage is measured by GNU time, which forks the program from
+    # its own small process. Waiting for the program directly would report the
+    # peak RSS of this process for it, which the forked child inherits.
     if time_file is not None:
-        time_cmd = _get_time_command()
-        result = subprocess.run([time_cmd, "-v", "-o", time_file, str(program), *args], capture_output=True, text=True,
-                                timeout=timeout, cwd=cwd)
-    else:
-        result = subprocess.run([str(program), *args], capture_output=True, text=True, timeout=timeout, cwd=cwd)
-    if log:
-        if log_prefix is None:
-            log_prefix = program.name
-        stdout_filename = f"{log_prefix}-stdout.txt"
-        stdout_path = stdout_filename if cwd is None else cwd / stdout_filename
-        with open(stdout_path, "w") as outputf:
-            outputf.write(result.stdout)
-        stderr_filename = f"{log_prefix}-stderr.txt"
-        stderr_path = stderr_filename if cwd is None else cwd / stderr_filename
-        with open(stderr_path, "w") as outputf:
-            outputf.write(result.stderr)
+        command = [_get_time_command(), "-v", "-o", time_file, *command]
+
+    # The output of the program is written to files, either the log files or
+    # temporary files, such that no pipe needs draining while waiting.
+    with contextlib.ExitStack() as stack:
+
+        if log:
+            if log_prefix is None:
+                log_prefix = os.path.basename(program)
+            stdout_file = stack.enter_context(open(os.path.join(log_path, f"{log_prefix}-stdout.txt"), "w+b"))
+            stderr_file = stack.enter_context(open(os.path.join(log_path, f"{log_prefix}-stderr.txt"), "w+b"))
+        else:
+            stdout_file = stack.enter_context(tempfile.TemporaryFile())
+            stderr_file = stack.enter_context(tempfile.TemporaryFile())
+
+        process = subprocess.Popen(command, stdout=stdout_file, stderr=stderr_file, cwd=cwd)
+
+        # The program is killed when it times out. It is only reaped while
+        # holding the lock, after it has exited, so the kill either reaches
+        # the program or its zombie and never a process that reused its PID.
+        reap_lock = threading.Lock()
+        timed_out = False
+
+        def kill():
+            nonlocal timed_out
+            with reap_lock:
+                if process.returncode is None:
+                    timed_out = True
+                    process.kill()
+
+        timer = None
+        if timeout is not None:
+            timer = threading.Timer(timeout, kill)
+            timer.start()
+        try:
+            os.waitid(os.P_PID, process.pid, os.WEXITED | os.WNOWAIT)
+            with reap_lock:
+                process.wait()
+        finally:
+            if timer is not None:
+                timer.cancel()
+
+        if timed_out:
+            raise subprocess.TimeoutExpired(command, timeout)
+
+        # Decode in one go, and do not fail on output that is not valid UTF-8.
+        # Only standard output is parsed by callers, so only that is read back
+        # if it was logged.
+        stdout_file.seek(0)
+        stdout = stdout_file.read().decode("utf-8", errors="replace")
+        stderr = None
+        if not log:
+            stderr_file.seek(0)
+            stderr = stderr_file.read().decode("utf-8", errors="replace")
+
+    result = subprocess.CompletedProcess(command, process.returncode, stdout, stderr)
     assert result.returncode == 0, f"Program '{program}' failed with exit code: {result.returncode}"
     return result
 
+def print_colored(color, message):
+
+    print(f"\033[{COLORS[color]}m{message}\033[0m")
+
+def get_num_cores():
+
+    # Respect the CPU affinity mask of the process where it is available.
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+def default_num_threads(num_jobs=1):
+
+    # A single job leaves one core for the profiler itself and the rest of the
+    # system. Concurrent jobs share the cores evenly.
+    if num_jobs == 1:
+        return max(1, get_num_cores() - 1)
+    return max(1, get_num_cores() // num_jobs)
+
+def prefetch_files(*filenames):
+
+    for filename in filenames:
+        if filename is None:
+            continue
+        try:
+            fd = os.open(filename, os.O_RDONLY)
+        except OSError:
+            continue
+        try:
+            # Let the kernel read ahead asynchronously if supported, otherwise
+            # read the file to pull it into the page cache.
+            if hasattr(os, "posix_fadvise"):
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+            else:
+                while os.read(fd, 1 << 20):
+                    pass
+        finally:
+            os.close(fd)
+
 def parse_elapsed_time(text):
 
     match = re.match(r"(?:([0-9]+)\:)?([0-9]+)\:([0-9]+(?:\.[0-9]+)?)", text)
@@ -54,26 +159,31 @@ def parse_elapsed_time(text):
             elapsed_time += float(value) * weight
     return elapsed_time
 
+# Statistics written to the time file (in the format of GNU time -v), which are
+# matched at the start of a line that ends with the value. Percentages are
+# matched without the percent sign.
+TIME_FILE_STATISTICS = {
+    "User time": ("user-time", float),
+    "System time": ("system-time", float),
+    "Percent of CPU": ("percent-cpu", float),
+    "Elapsed (wall clock) time": ("wall-clock-time", parse_elapsed_time),
+    "Maximum resident set size": ("max-rss", int)
+}
+TIME_FILE_STATISTICS_PATTERN = re.compile(r"^[^\S\n]*(" + "|".join(map(re.escape, TIME_FILE_STATISTICS)) + r").*?(\S+?)%?[^\S\n]*$", re.MULTILINE)
+
 def get_statistics_from_time_file(time_file, *, target_dict=None, key_prefix=""):
 
     if target_dict is None:
         target_dict = {}
 
-    for line in pathlib.Path(time_file).read_text().split("\n"):
-        if "User time" in line:
-            target_dict[key_prefix + "user-time"] = float(line.split()[-1])
-        elif "System time" in line:
-            target_dict[key_prefix + "system-time"] = float(line.split()[-1])
-        elif "Percent of CPU" in line:
-            text = line.split()[-1]
-            assert text[-1] == "%"
-            target_dict[key_prefix + "percent-cpu"] = float(text[:-1])
-        elif "Elapsed (wall clock) time" in line:
-            elapsed_time = parse_elapsed_time(line.split()[-1])
-            if elapsed_time is not None:
-                target_dict[key_prefix + "wall-clock-time"] = elapsed_time
-        elif "Maximum resident set size" in line:
-            target_dict[key_prefix + "max-rss"] = int(line.split()[-1])
+    with open(time_file) as infile:
+        text = infile.read()
+
+    for match in TIME_FILE_STATISTICS_PATTERN.finditer(text):
+        key, value_type = TIME_FILE_STATISTICS[match.group(1)]
+        value = value_type(match.group(2))
+        if value is not None:
+            target_dict[key_prefix + key] = value
 
     return target_dict
 
@@ -82,23 +192,9 @@ def get_statistics_from_stdout(stdout, *, target_dict=None, key_prefix=""):
     if target_dict is None:
         target_dict = {}
 
-    for line in stdout.split("\n"):
-        if "Data Load Time:" in line:
-            target_dict[key_prefix + "data-load-time"] = float(line.split()[-1])
-        if "Model Load Time:" in line:
-            target_dict[key_prefix + "model-load-time"] = float(line.split()[-1])
-        if "Model Store Time:" in line:
-            target_dict[key_prefix + "model-store-time"] = float(line.split()[-1])
-        if "Training Time:" in line:
-            target_dict[key_prefix + "training-time"] = float(line.split()[-1])
-        if "Classification Time:" in line:
-            target_dict[key_prefix + "classification-time"] = float(line.split()[-1])
-        if "Label Store Time:" in line:
-            target_dict[key_prefix + "label-store-time"] = float(line.split()[-1])
-        if "Maximum Depth:" in line:
-            target_dict[key_prefix + "max-tree-depth"] = int(line.split()[-1])
-        if "Maximum Node Count:" in line:
-            target_dict[key_prefix + "max-node-count"] = int(line.split()[-1])
+    for match in STDOUT_STATISTICS_PATTERN.finditer(stdout):
+        key, value_type = STDOUT_STATISTICS[match.group(1)]
+        target_dict[key_prefix + key] = value_type(match.group(2))
 
     return target_dict
 
@@ -152,19 +248,38 @@ def negative_predictive_value(num_true_positives, num_false_positives, num_true_
         return np.nan
     return num_true_negatives / denominator
 
+# Scores computed from the confusion matrix by get_classification_scores(),
+# which are stored under the specified keys.
+CLASSIFICATION_SCORES = {
+    "accuracy": accuracy,
+    "P4-metric": P4_metric,
+    "dor": diagnostic_odds_ratio,
+    "ppv": positive_predictive_value,
+    "tpr": true_positive_rate,
+    "tnr": true_negative_rate,
+    "npv": negative_predictive_value
+}
+
 def get_classification_scores(predicted_labels, labels, *, target_dict=None, key_prefix=""):
 
     predicted_labels, labels = np.asarray(predicted_labels), np.asarray(labels)
 
-    unique_labels = np.unique(labels)
-    if not np.array_equal(unique_labels, [0.0, 1.0]):
+    # Check the labels with a single mask each, instead of sorting them with
+    # np.unique(), which is only needed to report unexpected labels.
+    if not np.all((labels == 0) | (labels == 1)):
         raise ValueError(f"rfcperf currently only supports binary classification "
-                     f"(labels 0 and 1). Found labels: {unique_labels}")
+                     f"(labels 0 and 1). Found labels: {np.unique(labels)}")
+    assert np.all((predicted_labels == 0) | (predicted_labels == 1)), "Predicted labels should be either 0 or 1."
+
+    # Count all four combinations of label and predicted label in a single
+    # pass.
+    codes = 2 * labels.astype(np.int8).ravel() + predicted_labels.astype(np.int8).ravel()
+    num_true_negatives, num_false_positives, num_false_negatives, num_true_positives = \
+        np.bincount(codes, minlength=4).tolist()
 
-    num_true_positives  = np.sum((predicted_labels == 1.0) & (labels == 1.0))
-    num_false_positives = np.sum((predicted_labels == 1.0) & (labels == 0.0))
-    num_true_negatives  = np.sum((predicted_labels == 0.0) & (labels == 0.0))
-    num_false_negatives = np.sum((predicted_labels == 0.0) & (labels == 1.0))
+    if num_true_negatives + num_false_positives == 0 or num_false_negatives + num_true_positives == 0:
+        raise ValueError(f"rfcperf currently only supports binary classification "
+                     f"(labels 0 and 1). Found labels: {np.unique(labels)}")
 
     num_total = num_true_positives + num_false_positives + num_true_negatives + num_false_negatives
     assert num_total == len(labels)
@@ -172,19 +287,8 @@ def get_classification_scores(predicted_labels, labels, *, target_dict=None, key
     if target_dict is None:
         target_dict = {}
 
-    target_dict[key_prefix + "accuracy"] = \
-        accuracy(num_true_positives, num_false_positives, num_true_negatives, num_false_negatives)
-    target_dict[key_prefix + "P4-metric"] = \
-        P4_metric(num_true_positives, num_false_positives, num_true_negatives, num_false_negatives)
-    target_dict[key_prefix + "dor"] = \
-        diagnostic_odds_ratio(num_true_positives, num_false_positives, num_true_negatives, num_false_negatives)
-    target_dict[key_prefix + "ppv"] = \
-        positive_predictive_value(num_true_positives, num_false_positives, num_true_negatives, num_false_negatives)
-    target_dict[key_prefix + "tpr"] = \
-        true_positive_rate(num_true_positives, num_false_positives, num_true_negatives, num_false_negatives)
-    target_dict[key_prefix + "tnr"] = \
-        true_negative_rate(num_true_positives, num_false_positives, num_true_negatives, num_false_negatives)
-    target_dict[key_prefix + "npv"] = \
-        negative_predictive_value(num_true_positives, num_false_positives, num_true_negatives, num_false_negatives)
+    for key, score_func in CLASSIFICATION_SCORES.items():
+        target_dict[key_prefix + key] = \
+            score_func(num_true_positives, num_false_positives, num_true_negatives, num_false_negatives)
 
     return target_dict